@@ -71,9 +71,14 @@ fi
 #Variables
 Name="${email%%.*}"
 gather_wait_time_pre1="30"
-gather_wait_time_pre2="10"
 gather_wait_time="180"
+wait_min_interval="15"
+wait_scheduler="${QC_WAIT_SCHEDULER:-slurm}"
 basic="basic"
+qifaPipelineDir="/gt/research_development/qifa/elion/software/qifa-ops/0.1.0"
+fastqc_archive_codec="bzip2"
+fastqc_archive_level="9"
+fastqc_archive_threads="${QC_ARCHIVE_THREADS:-$(( $(nproc) < 8 ? $(nproc) : 8 ))}" #qifa-script runs on a shared interactive host
 ########################################################
 #Set directory so qifa-script have no issue when entering sudo
 if [[ "$qcDir" ]]; then
@@ -106,7 +111,7 @@ fi
 #Check pipeline list
 
 function pipeline_file_check {
-pipelinelist=/gt/research_development/qifa/elion/software/qifa-ops/0.1.0/qifa-qc-scripts/pipelinelist/pipelinelist.txt
+pipelinelist=$qifaPipelineDir/qifa-qc-scripts/pipelinelist/pipelinelist.txt
 if [ ! -f "$pipelinelist" ]; then
 	echo "ERROR: Missing list of pipelinelist.txt"
 	echo -e '\tPipeline location: /gt/research_development/qifa/elion/software/qifa-ops/0.1.0/qifa-qc-scripts/pipelinelist/'
@@ -408,17 +413,43 @@ function qifa_catch_error {
 
 ####################################################################################################################################################################################
 
+######Wait for submitted jobs of a qc application, then gather until qifa-qc reports completion
+#Jobs are those submitted since $qc_submit_time (set just before qifa-qc run), plus any sbatch job IDs found in the run log.
+#They are checked against the scheduler queue with adaptive backoff.
+#Jobs leaving the queue is not proof of completion, so the gather log must still say "Please proceed to report result".
+#Falls back to polling qifa-qc gather if no job could be tracked or the gather is incomplete; that polling backs off the same way.
+#Returns 1 if gather reports failed or missing job submissions.
+function wait_qc_jobs {
+if python3 $qifaPipelineDir/waitQCjobs.py wait --log ${Project_ID}_QCreport.$1.log --since $qc_submit_time --scheduler $wait_scheduler \
+	--minInterval $wait_min_interval --maxInterval $gather_wait_time > ${Project_ID}_QCreport.$1.wait.log 2>&1 ; then
+	qifa-qc gather -q $1 2>&1> ${Project_ID}_QCreport.$1.gather.log
+else
+	echo -e 'WARNING! Could not track '$1' jobs. See '${Project_ID}_QCreport.$1.wait.log'. Polling qifa-qc gather instead'
+	sleep $gather_wait_time_pre1
+	qifa-qc gather -q $1 2>&1> ${Project_ID}_QCreport.$1.gather.log
+fi
+gather_interval=$wait_min_interval
+until grep -q "Please proceed to report result" ${Project_ID}_QCreport.$1.gather.log ;
+do
+	if grep -qE "job\(s\) failed|Please complete the .* qc job submission" ${Project_ID}_QCreport.$1.gather.log ; then
+		return 1
+	fi
+	qifa_catch_error
+	sleep $gather_interval
+	gather_interval=$(( gather_interval * 2 < gather_wait_time ? gather_interval * 2 : gather_wait_time ))
+	qifa-qc gather -q $1 2>&1> ${Project_ID}_QCreport.$1.gather.log
+done
+}
+
 ######Define function for basic qc
 function run_basic_qc {
 qc_folder
+qc_submit_time=$(date +%s)
 if	qifa-qc run -q $basic 2>&1> ${Project_ID}_QCreport.${basic}.log; then
 	if [ -f "${Project_ID}_QCreport.${basic}.log" ]; then
 		echo "INFO: Basic QC job submitted!"
 		qifa_catch_error
-		sleep $gather_wait_time_pre1
-		qifa-qc gather -q $basic 2>&1> ${Project_ID}_QCreport.${basic}.gather.log
-		sleep $gather_wait_time_pre2
-		qifa-qc gather -q $basic 2>&1> ${Project_ID}_QCreport.${basic}.gather.log
+		wait_qc_jobs $basic
 		qifa_catch_error
 		if grep -q "basic_QC job(s) failed" ${Project_ID}_QCreport.${basic}.gather.log ; then
 			echo
@@ -433,13 +464,6 @@ if	qifa-qc run -q $basic 2>&1> ${Project_ID}_QCreport.${basic}.log; then
 			echo "Program terminated!"
 			exit 1;
 		else
-			until qifa-qc gather -q $basic | grep "Please proceed to report result" 2>&1> ${Project_ID}_QCreport.${basic}.gather.log ; 
-			do
-				qifa-qc gather -q $basic 2>&1> ${Project_ID}_QCreport.${basic}.gather.log 
-  				sleep $gather_wait_time
-			done
-			qifa-qc gather -q $basic 2>&1> ${Project_ID}_QCreport.${basic}.gather.log
-			qifa_catch_error
   			echo "INFO: Basic QC metrics gathered!"
 			qifa-qc report -q $basic 2>&1> ${Project_ID}_QCreport.${basic}.report.log
 			echo "INFO: Basic QC metrics reported!"
@@ -481,6 +505,7 @@ if [[ ! -z "$Pipeline" ]] ; then
 	echo "INFO: Will now determine QC Pipeline status..."
 	echo -e 'INFO: Pipeline determined as '$Pipeline''
 	echo -e 'INFO: Initiating qifa-qc run -q '$Pipeline''
+	qc_submit_time=$(date +%s)
 	qifa-qc run -q $Pipeline 2>&1> ${Project_ID}_QCreport.$Pipeline.log
 	qifa_catch_error
 	echo -e 'INFO: "qifa-qc run -q '$Pipeline'" initiated and '${Project_ID}_QCreport.$Pipeline.log' will be created'
@@ -494,13 +519,13 @@ if [[ ! -z "$Pipeline" ]] ; then
 	else
 		if [ -f "${Project_ID}_QCreport.$Pipeline.log" ]; then
 			qifa_catch_error
-			until qifa-qc gather -q $Pipeline | grep "Please proceed to report results" 2>&1> ${Project_ID}_QCreport.$Pipeline.gather.log ; 
-			do
-				qifa-qc gather -q $Pipeline 2>&1> ${Project_ID}_QCreport.$Pipeline.gather.log
-				qifa_catch_error 
-  				sleep $gather_wait_time
-			done
-			qifa-qc gather -q $Pipeline 2>&1> ${Project_ID}_QCreport.$Pipeline.gather.log
+			if ! wait_qc_jobs $Pipeline ; then
+				echo
+				echo -e 'ERROR: '$Pipeline' job(s) failed or have no submission. Check '${Project_ID}_QCreport.$Pipeline.gather.log''
+				echo
+				echo "Program terminated!"
+				exit 1;
+			fi
 			qifa_catch_error
   			echo -e 'INFO: '$Pipeline' QC metrics gathered!'
 			qifa-qc report -q $Pipeline 2>&1> ${Project_ID}_QCreport.$Pipeline.report.log
@@ -565,6 +590,7 @@ if  grep -qw "$Multi_pipelines" $pipelinelist ; then
 	echo "INFO: Will now determine QC pipeline status..."
 	echo -e 'INFO: pipeline determined as '$Multi_pipelines''
 	echo -e 'INFO: Initiating qifa-qc run -q '$Multi_pipelines''
+	qc_submit_time=$(date +%s)
 	qifa-qc run -q $Multi_pipelines 2>&1> ${Project_ID}_QCreport.$Multi_pipelines.log
 	qifa_catch_error
 	echo -e 'INFO: "qifa-qc run -q '$Multi_pipelines'" initiated and '${Project_ID}_QCreport.$Multi_pipelines.log' will be created'
@@ -578,13 +604,13 @@ if  grep -qw "$Multi_pipelines" $pipelinelist ; then
 	else
 		if [ -f "${Project_ID}_QCreport.$Multi_pipelines.log" ]; then
 			qifa_catch_error
-			until qifa-qc gather -q $Multi_pipelines | grep "Please proceed to report results" 2>&1> ${Project_ID}_QCreport.$Multi_pipelines.gather.log ; 
-			do
-				qifa-qc gather -q $Multi_pipelines 2>&1> ${Project_ID}_QCreport.$Multi_pipelines.gather.log 
-				qifa_catch_error
-  				sleep $gather_wait_time
-			done
-			qifa-qc gather -q $Multi_pipelines 2>&1> ${Project_ID}_QCreport.$Multi_pipelines.gather.log
+			if ! wait_qc_jobs $Multi_pipelines ; then
+				echo
+				echo -e 'ERROR: '$Multi_pipelines' job(s) failed or have no submission. Check '${Project_ID}_QCreport.$Multi_pipelines.gather.log''
+				echo
+				echo "Program terminated!"
+				exit 1;
+			fi
 			qifa_catch_error
   			echo -e 'INFO: '$Multi_pipelines' QC metrics gathered!'
 			qifa-qc report -q $Multi_pipelines 2>&1> ${Project_ID}_QCreport.$Multi_pipelines.report.log
@@ -626,6 +652,19 @@ fi
 done
 }
 
+##################Stream fastqc *html reports into a multi-core compressed archive
+function fastqc_archive {
+if python3 $qifaPipelineDir/packageFastqcReports.py --inputDir $qcFolder/fastqc --outputFile ${ProjFileName}_FASTQCreports.tgz \
+	--codec $fastqc_archive_codec --level $fastqc_archive_level --threads $fastqc_archive_threads > html.log 2>&1 ; then
+	rm html.log
+	echo -e 'INFO: Fastqc html compressed @ /gt/data/seqdma/Reports/'${ProjReportDir}/${ProjFileName}_FASTQCreports.tgz''
+else
+	cat html.log
+	rm html.log
+	echo -e 'ERROR: Fastqc html could not be compressed into /gt/data/seqdma/Reports/'${ProjReportDir}''
+fi
+}
+
 ##################Copy fastqc *html reports
 function fastqc_report {
 release=$(echo ${Project_ID}_QCreport.*.release.log)
@@ -641,11 +680,7 @@ if [ -d "$ProjReportDir" ]; then
 		rm -r -I $ProjReportDir
 		mkdir $ProjReportDir
 		cd $ProjReportDir
-		rsync -va $qcFolder/fastqc/*html . > html.log
-		rm html.log
-		tar -cjvf ${ProjFileName}_FASTQCreports.tgz *html > html.log
-		rm html.log
-		echo -e 'INFO: Fastqc html copied and compressed @ /gt/data/seqdma/Reports/'${ProjReportDir}/${ProjFileName}_FASTQCreports.tgz''
+		fastqc_archive
 	elif
 		[[ $y == "n" ]]; then
 		echo
@@ -653,20 +688,12 @@ if [ -d "$ProjReportDir" ]; then
 	else
 		mkdir $ProjReportDir
 		cd $ProjReportDir
-		rsync -va $qcFolder/fastqc/*html . > html.log
-		rm html.log
-		tar -cjvf ${ProjFileName}_FASTQCreports.tgz *html > html.log
-		rm html.log
-		echo -e 'INFO: Fastqc html copied and compressed @ /gt/data/seqdma/Reports/'${ProjReportDir}/${ProjFileName}_FASTQCreports.tgz''
+		fastqc_archive
 	fi
 else
 	mkdir $ProjReportDir
 	cd $ProjReportDir
-	rsync -va $qcFolder/fastqc/*html . > html.log
-	rm html.log
-	tar -cjvf ${ProjFileName}_FASTQCreports.tgz *html > html.log
-	rm html.log
-	echo -e 'INFO: Fastqc html copied and compressed @ /gt/data/seqdma/Reports/'${ProjReportDir}/${ProjFileName}_FASTQCreports.tgz''
+	fastqc_archive
 fi
 }
 
@@ -4,14 +4,21 @@ import os
 import re
 import pandas as pd
 from glob import glob
+import sqlite3
 import subprocess
+import sys
 from datetime import datetime, timedelta
 
+qifaPipelineDir = "/gt/research_development/qifa/elion/software/qifa-ops/0.1.0" # Installed helpers, same location gatherwebQCmetrics.sh uses
+sys.path.insert(0, qifaPipelineDir)
+from qcDirState import QCDirState
+
 # --- Configuration ---
 Application = "speciesid"
 OUT = f"/gt/data/seqdma/GTwebMetricsTables"
-QCDirFileSuccess = os.path.join(OUT, f".{Application}.QCDir.update.txt") # File to log successfully processed directories
-QCDirFileFail = os.path.join(OUT, f".{Application}.QCDir.ToCollectQC.txt") # File to log successfully processed directories
+QCDirFileSuccess = os.path.join(OUT, f".{Application}.QCDir.update.txt") # Legacy log of processed directories, migrated into the state store
+QCDirFileFail = os.path.join(OUT, f".{Application}.QCDir.ToCollectQC.txt") # Legacy log of failed directories, migrated into the state store
+QCDirStateDB = os.path.join(OUT, ".whitelist_QCdir", "qcdir_state.sqlite") # State store shared with gatherwebQCmetrics.sh
 report_pattern = f"*QCreport.{Application}.csv"
 search_dirs_first = ["/gt/data/seqdma/qifa", "/gt/data/seqdma/.qifa.qc-archive"] # Directories to search on the first run
 search_dirs_next = ["/gt/data/seqdma/qifa"] # Directories to search on subsequent runs
@@ -19,21 +26,11 @@ search_dirs_next = ["/gt/data/seqdma/qifa"] # Directories to search on subsequen
 os.makedirs(OUT, exist_ok=True)
 
 # --- Utility Functions ---
-# Read previously processed directory paths from a text file
-def read_previous_paths(file):
-    if os.path.exists(file):
-        with open(file) as f:
-            return set(line.strip() for line in f)
-    return set()
-
-# Append new paths to the log file if they haven’t been written before
-def write_paths(file, paths, already_written):
-    new_paths = [p for p in paths if p not in already_written]
-    if new_paths:
-        with open(file, 'a') as f:
-            for path in new_paths:
-                f.write(path + "\n")
-    return already_written.union(new_paths)
+# Stop on a state store failure (e.g. SQLite busy timeout on the shared filesystem) instead of a traceback
+def exit_on_state_error(error, consequence):
+    print(f"Error accessing QC directory state store {QCDirStateDB}: {error}")
+    print(consequence)
+    sys.exit(1)
 
 # Extract metadata from a .settings.json file in each folder
 def extract_metadata_from_setting(setting_file):
@@ -143,21 +140,31 @@ def manage_backups(metrics_file, updated):
 
 # --- Main Script ---
 
-# Read previously processed paths
-processed_success = read_previous_paths(QCDirFileSuccess)
-processed_fail = read_previous_paths(QCDirFileFail)
+# Open the state store, importing the legacy flat files on first use (done last so later successes win)
+try:
+    state = QCDirState(QCDirStateDB)
+    state.migrate_flat_file(Application, QCDirFileFail, "failed")
+    state.migrate_flat_file(Application, QCDirFileSuccess, "done")
+    first_run = not state.is_initialised(Application)
+except (sqlite3.Error, OSError) as e:
+    exit_on_state_error(e, "No metrics collected for this run.")
 
 # Use full archive for the first run; otherwise, only look in active dir
-search_dirs = search_dirs_first if not processed_success else search_dirs_next
+search_dirs = search_dirs_first if first_run else search_dirs_next
 
 # Scan directories for candidate report files
-all_dirs_to_process = set()
+candidate_dirs = []
 print("🔍 Scanning for QC report files...")
 for base_dir in search_dirs:
     for path in glob(f"{base_dir}/**/{report_pattern}", recursive=True):
-        folder_path = os.path.dirname(path)
-        if folder_path not in processed_success:
-            all_dirs_to_process.add(folder_path)
+        candidate_dirs.append(os.path.dirname(path))
+
+# Keep only folders not already processed; the first scan is recorded so later runs skip the archive
+try:
+    all_dirs_to_process = set(state.filter_new(Application, candidate_dirs))
+    state.initialise(Application)
+except sqlite3.Error as e:
+    exit_on_state_error(e, "No metrics collected for this run.")
 
 print(f"Found {len(all_dirs_to_process)} candidate folders to process.")
 
@@ -243,9 +250,13 @@ if final_dfs:
     else:
         manage_backups(metrics_output_file, updated=False)
 
-# Log processed paths
-processed_success = write_paths(QCDirFileSuccess, success_paths, processed_success)
-processed_fail = write_paths(QCDirFileFail, fail_paths, processed_fail)
+# Record processed paths
+try:
+    state.mark(Application, success_paths, "done")
+    state.mark(Application, fail_paths, "failed")
+    state.close()
+except sqlite3.Error as e:
+    exit_on_state_error(e, "Processed paths were not recorded; they will be recollected next run and duplicate metrics dropped on merge.")
 
-print(f"\n Updated: {QCDirFileSuccess}")
-print(f" Skipped/Failed: {QCDirFileFail}")
+print(f"\n Updated: {len(success_paths)} done in {QCDirStateDB}")
+print(f" Skipped/Failed: {len(fail_paths)} to recollect in {QCDirStateDB}")
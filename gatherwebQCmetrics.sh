@@ -25,6 +25,7 @@ QCdir_pacbio_nonarchive="/gt/data/seqdma/qifa-pb"
 QCdir_ont_nonarchive="/gt/data/seqdma/qifa-ont"
 QCdir_archive="/gt/data/seqdma/.qifa.qc-archive"
 qifaPipelineDir="/gt/research_development/qifa/elion/software/qifa-ops/0.1.0"
+qcDirStateScript="$qifaPipelineDir/qcDirState.py"
 export SETJSONFILE=".settings.json"
 export RunInfo="RunInfo.xml"
 # ─────────────────────────────────────────────────────────────
@@ -60,8 +61,13 @@ check_duckdb_installed() {
 # ─────────────────────────────────────────────────────────────
 # Initialization wrapper
 init_command_per_app() {
-  check_list_temp_script
-  set_global_paths
+  # Missing scripts or an unreadable state store skip the application (mail already sent)
+  if ! check_list_temp_script; then
+    return 1
+  fi
+  if ! set_global_paths; then
+    return 1
+  fi
 
   # Skip application if whitelist fails
   if ! whitelist_QCdir; then
@@ -96,6 +102,12 @@ check_list_temp_script() {
       | mail -s "[DASHBOARD] GT interface missing gatherApplicationMetrics.js" "$Email"
     return 1
   fi
+  if [[ ! -f "$qcDirStateScript" ]]; then
+    log_error "Missing qcDirState.py"
+    echo -e "ERROR: Missing $qcDirStateScript\nProgram aborted!" \
+      | mail -s "[DASHBOARD] GT interface missing qcDirState.py" "$Email"
+    return 1
+  fi
 
   clean_app="$(echo "$Application" | tr -d '[:space:]' | tr '[:lower:]' '[:upper:]')"
 
@@ -126,10 +138,15 @@ set_global_paths() {
   reset_check_file="$OUT/.whitelist_QCdir/non_archive_scan_tracker/$Application.QCDir_nonarchive.update.reset_day_start.txt"
   qcdir_file_list="$OUT/.whitelist_QCdir/$Application.qcdir_file_list.txt"
   qcdir_file_update_list="$OUT/.whitelist_QCdir/$Application.qcdir_file_update_list.txt"
+  qcdir_state_db="$OUT/.whitelist_QCdir/qcdir_state.sqlite"
   nonarchive_tmp_file="$OUT/.whitelist_QCdir/.tmp.QCDir_nonarchive.$Application"
-  nonarchive_dirlist_file="$OUT/.whitelist_QCdir/.DirList.$Application"
   pulling_undelivered_qc_flag="$OUT/.whitelist_QCdir/$Application.activate_collecting_undelivered_metrics_from_archive.txt"
 
+  # One-time import of the legacy flat whitelist files into the state store (renamed to *.migrated afterwards)
+  if [[ -f "$qcdir_file_update_list" || -f "$qcdir_file_list" ]]; then
+    qcdir_state migrate --file "$qcdir_file_update_list" --status done || { qcdir_state_error; return 1; }
+    qcdir_state migrate --file "$qcdir_file_list" --status pending || { qcdir_state_error; return 1; }
+  fi
 
   unmatched_species_log="$OUT/.logs/unmatched_species_samples.log"
 
@@ -154,6 +171,51 @@ set_global_paths() {
 # - Resets tracking every 10 days
 #---------------------------------------------------
 
+#------------------------------------------------------------------
+# Function: qcdir_state
+# Purpose : Query/update the per-application QC directory state store
+#           (pending = current batch, done = collected, failed = recollect).
+#           Keys are project directories; see qcDirState.py for subcommands.
+#------------------------------------------------------------------
+qcdir_state() {
+  python3 "$qcDirStateScript" --db "$qcdir_state_db" --app "$Application" "$@"
+}
+
+#------------------------------------------------------------------
+# Function: qcdir_state_error
+# Purpose : Report a failed state store query (e.g. SQLite busy timeout on
+#           the shared filesystem) so it is not mistaken for "nothing new"
+#           Optional $1 describes the consequence for the mail body.
+#------------------------------------------------------------------
+qcdir_state_error() {
+  local consequence="${1:-Metric collection skipped for $Application this run.}"
+  log_error "[$Application] QC directory state store query failed → $qcdir_state_db"
+  echo -e "ERROR: qcDirState.py failed for $Application on $qcdir_state_db\n\n$consequence" \
+    | mail -s "[DASHBOARD] GT interface QC directory state store failure for $Application" "$Email"
+}
+
+#------------------------------------------------------------------
+# Function: mark_qcdir_failed
+# Purpose : Record $ProjDir as failed so the next run recollects it.
+#           A store failure is reported but does not stop collection.
+#------------------------------------------------------------------
+mark_qcdir_failed() {
+  qcdir_state mark --status failed --dir "$ProjDir" \
+    || qcdir_state_error "$ProjDir could not be recorded as failed; it stays pending and will not be recollected automatically."
+}
+
+#------------------------------------------------------------------
+# Function: filter_new_qcdirs
+# Purpose : Read candidate <ProjDir>/<Application> directories on stdin and
+#           print those whose project directory is not yet done. Replaces
+#           grep -vf against the flat update list with one set query.
+#           Returns the exit status of the state store query, not of sed.
+#------------------------------------------------------------------
+filter_new_qcdirs() {
+  sed 's#/[^/]*$##' | qcdir_state filter | sed "s#\$#/$Application#"
+  return "${PIPESTATUS[1]}"
+}
+
 #------------------------------------------------------------------
 # Function: app_match
 # Purpose : Check if Application exists in any valid DuckDB table
@@ -288,48 +350,38 @@ whitelist_QCdir() {
   if [[ "$day_5_countdown" -ge 5 ]]; then
     log_info "[$Application] Scanning archived directories for application (30-day refresh)."
     if [[ "$Application" == "PacBio" || "$Application" == "ONT" ]]; then
-      find_longread_directories_archive > "$qcdir_file_list"
+      DirList=$(find_longread_directories_archive | filter_new_qcdirs) || { qcdir_state_error; return 1; }
     else
-      find "$QCdir_archive" -type d -name "$Application" > "$qcdir_file_list"
+      DirList=$(find "$QCdir_archive" -type d -name "$Application" | filter_new_qcdirs) || { qcdir_state_error; return 1; }
     fi        
-    if [[ -f "$qcdir_file_update_list" ]]; then
-        grep -vf "$qcdir_file_update_list" "$qcdir_file_list" | awk '!seen[$0]++' > "$nonarchive_dirlist_file"
-        mv "$nonarchive_dirlist_file" "$qcdir_file_list"
-        DirList=$(cat "$qcdir_file_list")
-    fi
     echo "$day_present" > "$archive_check_file"
     touch "$pulling_undelivered_qc_flag"
   # Step 4: If database exists, look for newly added non-archived directories
   elif [[ -s "$duckDB_PATH" ]]; then
-    if app_match | grep -Fxq "$Application" && [[ -f "$qcdir_file_list" ]]; then
+    # Exit 4 means not yet initialised; anything else non-zero is a store failure
+    qcdir_initialised=0
+    qcdir_state initialised || qcdir_initialised=$?
+    if [[ "$qcdir_initialised" -ne 0 && "$qcdir_initialised" -ne 4 ]]; then
+      qcdir_state_error
+      return 1
+    fi
+    if app_match | grep -Fxq "$Application" && [[ "$qcdir_initialised" -eq 0 ]]; then
       log_info "[$Application] found in database. Will now search for new QC directory...."
-      cat "$qcdir_file_list" >> "$qcdir_file_update_list"
-      awk '!seen[$0]++' "$qcdir_file_update_list" > "$nonarchive_tmp_file"
-      mv "$nonarchive_tmp_file" "$qcdir_file_update_list"
+      # Directories left pending by the previous run were collected successfully
+      qcdir_state promote --from pending --to done || { qcdir_state_error; return 1; }
+      #if project was previously collected, skip the directory and collect only new project
       if [[ "$Application" == "PacBio" || "$Application" == "ONT" ]]; then
-        find_longread_directories_nonarchive > "$qcdir_file_list"
+        DirList=$(find_longread_directories_nonarchive | filter_new_qcdirs) || { qcdir_state_error; return 1; }
       else
-        find "$QCdir_illumina_nonarchive" -type d -name "$Application" > "$qcdir_file_list"
+        DirList=$(find "$QCdir_illumina_nonarchive" -type d -name "$Application" | filter_new_qcdirs) || { qcdir_state_error; return 1; }
       fi
-      #if project was previously collected, remove the directory and collect only new project
-      grep -vf "$qcdir_file_update_list" "$qcdir_file_list" | awk '!seen[$0]++' > "$nonarchive_dirlist_file"
-      mv "$nonarchive_dirlist_file" "$qcdir_file_list"
-      DirList=$(cat "$qcdir_file_list")
     else
-      log_warn "[$Application] missing in database or [$qcdir_file_list]. Starting directory collection from archival and non-archival sources..."
+      log_warn "[$Application] missing in database or not yet initialised in [$qcdir_state_db]. Starting directory collection from archival and non-archival sources..."
       if [[ "$Application" == "PacBio" || "$Application" == "ONT" ]]; then
-        find_longread_directories_nonarchive > "$qcdir_file_list"
-        find_longread_directories_archive >> "$qcdir_file_list"
+        DirList=$( { find_longread_directories_nonarchive; find_longread_directories_archive; } | filter_new_qcdirs) || { qcdir_state_error; return 1; }
       else
-        find "$QCdir_illumina_nonarchive" "$QCdir_archive" -type d -name "$Application" > "$qcdir_file_list"
-      fi
-      awk '!seen[$0]++' "$qcdir_file_list" > "$nonarchive_tmp_file"
-      mv "$nonarchive_tmp_file" "$qcdir_file_list"
-      if [[ -f "$qcdir_file_update_list" ]]; then
-        grep -vf "$qcdir_file_update_list" "$qcdir_file_list" | awk '!seen[$0]++' > "$nonarchive_dirlist_file"
-        mv "$nonarchive_dirlist_file" "$qcdir_file_list"
+        DirList=$(find "$QCdir_illumina_nonarchive" "$QCdir_archive" -type d -name "$Application" | filter_new_qcdirs) || { qcdir_state_error; return 1; }
       fi
-      DirList=$(cat "$qcdir_file_list")
       #touch "$pulling_undelivered_qc_flag"
     fi
   # Step 5: If no existing metrics file, scan both non-archived and archived
@@ -337,17 +389,15 @@ whitelist_QCdir() {
     log_info "[$Application] Collecting QC directories from both the archival and non-archival..."
     log_info "[$Application] 30 days countdown to look-back into archival now set..."
     if [[ "$Application" == "PacBio" || "$Application" == "ONT" ]]; then
-      find_longread_directories_nonarchive > "$qcdir_file_list"
-      find_longread_directories_archive >> "$qcdir_file_list"
+      DirList=$( { find_longread_directories_nonarchive; find_longread_directories_archive; } | awk '!seen[$0]++')
     else
-      find "$QCdir_illumina_nonarchive" "$QCdir_archive" -type d -name "$Application" > "$qcdir_file_list"
+      DirList=$(find "$QCdir_illumina_nonarchive" "$QCdir_archive" -type d -name "$Application" | awk '!seen[$0]++')
     fi
-    awk '!seen[$0]++' "$qcdir_file_list" > "$nonarchive_tmp_file"
-    mv "$nonarchive_tmp_file" "$qcdir_file_list"
-    DirList=$(cat "$qcdir_file_list")
     echo "$day_present" > "$archive_check_file"
     #touch "$pulling_undelivered_qc_flag"
   fi
+  # Mark the application as scanned; survives the 10-day reset below
+  qcdir_state init || { qcdir_state_error; return 1; }
   # Step 6: Reset non-archive update tracker every 10 days
   if [[ -s "$reset_check_file" ]]; then
     day_10_start=$(cat "$reset_check_file")
@@ -356,7 +406,7 @@ whitelist_QCdir() {
 
     if [[ "$day_10_countdown" -ge 10 ]]; then
       log_info "[$Application] Resetting non-archive update list after 10 days."
-      truncate -s 0 "$qcdir_file_update_list"
+      qcdir_state clear --status done || { qcdir_state_error; return 1; }
       echo "$day_present" > "$reset_check_file"
     fi
   else
@@ -412,7 +462,7 @@ update_ProjDir_list() {
   done
 
   ProjTotal=$(printf "%s\n" "$ProjDirs" | sed '/^\s*$/d' | wc -l)
-  echo -en "$ProjDirs" > "$qcdir_file_list"
+  printf "%s" "$ProjDirs" | qcdir_state mark --status pending --replace || { qcdir_state_error; return 1; }
 
   if [[ "$ProjTotal" -eq 0 ]]; then
     log_warn "[$Application] No eligible project directories found. Exiting update_ProjDir_list function."
@@ -507,11 +557,8 @@ QCdir_updatelist() {
   fi
 
   if [[ "$skip" -eq 1 ]]; then
-    if grep -q "$ProjDir" "$qcdir_file_list"; then
-      grep -v "$ProjDir" "$qcdir_file_list" > "$nonarchive_tmp_file"
-      mv "$nonarchive_tmp_file" "$qcdir_file_list"
-      log_info "[$Application] will recollect $ProjDir in future gather"
-    fi
+    mark_qcdir_failed
+    log_info "[$Application] will recollect $ProjDir in future gather"
     return 1  # Signal to database function that this project should be skipped. continue to next is called in databae function
   fi
   return 0
@@ -530,8 +577,7 @@ pivot_long_illumina() {
 
   if [[ -z "$start_col" ]]; then
     log_error "[$Application] Pivoting long....: Column 'Reads_Total' not found! at $metrics_csv"
-    grep -v "$ProjDir" "$qcdir_file_list" > "$nonarchive_tmp_file"
-    mv "$nonarchive_tmp_file" "$qcdir_file_list"
+    mark_qcdir_failed
     log_info "[$Application] will recollect $ProjDir in future gather"
     return 1
   fi
@@ -645,8 +691,7 @@ function gather_illumina_metrics_js {
     echo -e "Failed gather $qifaPipelineDir/gatherApplicationMetrics.js getmetrics → ProjectID $projectId → QCdir $ProjDir" >> "$duckDB_missing_metrics"
     awk '!seen[$0]++' "$duckDB_missing_metrics" > "$nonarchive_tmp_file"
     mv "$nonarchive_tmp_file" "$duckDB_missing_metrics"
-    grep -v "$ProjDir" "$qcdir_file_list" > "$nonarchive_tmp_file"
-    mv "$nonarchive_tmp_file" "$qcdir_file_list"
+    mark_qcdir_failed
     log_info "[$Application] will recollect $ProjDir in future gather"
     return 1
   fi
@@ -723,8 +768,7 @@ pivot_long_longread() {
 
   if (( start_idx < 0 )); then
     log_error "[PIVOT_LONG_longread] pivot_long_longread: No numeric column found in $metrics_csv"
-    grep -v "$ProjDir" "$qcdir_file_list" > "$nonarchive_tmp_file"
-    mv "$nonarchive_tmp_file" "$qcdir_file_list"
+    mark_qcdir_failed
     log_info "[$Application] will recollect $ProjDir in future gather"
     return 1
   fi
@@ -790,8 +834,7 @@ gather_metrics_pacbio() {
       log_warn "[$Application] Using fallback report: $(basename "$fb")"
     else
       log_error "[$Application] No QC or Run_Report for ${projectFinal}"
-      grep -v "$ProjDir" "$qcdir_file_list" > "$nonarchive_tmp_file"
-      mv "$nonarchive_tmp_file" "$qcdir_file_list"
+      mark_qcdir_failed
       log_info "[$Application] will recollect $ProjDir in future gather"
       return 1
     fi
@@ -1003,8 +1046,7 @@ gather_metrics_ont() {
   fi
   if [[ -z $QC_Report ]]; then
     log_error "[$Application] No QC_Report or QCreport for ${projectFinal}"
-    grep -v "$ProjDir" "$qcdir_file_list" > "$nonarchive_tmp_file"
-    mv "$nonarchive_tmp_file" "$qcdir_file_list"
+    mark_qcdir_failed
     log_info "[$Application] will recollect $ProjDir in future gather"
     return 1
   fi
@@ -1200,8 +1242,7 @@ duckDB_call() {
       #If the import file csv has fewer or more than 14 columns, or a wrong header, the SELECT will fail
       if [[ $(head -n1 "$metrics_file" | awk -F',' '{print NF}') -lt 14 ]]; then
         log_error "Header mismatch in $metrics_file"
-        grep -v "$ProjDir" $qcdir_file_list > $nonarchive_tmp_file
-        mv $nonarchive_tmp_file $qcdir_file_list 
+        mark_qcdir_failed
         log_info "[$Application] will recollect $ProjDir in future gather"
         rm -f "$lane_tmp"  
         return 1
@@ -1278,8 +1319,9 @@ EOF
     if [[ "$success" -eq 0 ]]; then
       log_error "[$Application] ❌ DuckDB insert failed at all memory limits: ${memory_limits[*]}"
       echo "DuckDB insert failure: Out of memory at all fallback levels" >> "$duckDB_logfile"
-      log_warn "Resetting all directory inside [$qcdir_file_list] due to memory limits: ${memory_limits[*]}"
-      truncate -s 0 "$qcdir_file_list"
+      log_warn "Resetting all pending directories in [$qcdir_state_db] due to memory limits: ${memory_limits[*]}"
+      qcdir_state clear --status pending \
+        || qcdir_state_error "Pending directories could not be reset; they will be marked done on the next run without their metrics."
       exit 1
     fi
 
@@ -1318,8 +1360,7 @@ EOF
 insert_pacbio_metrics_to_duckdb() {
   if [[ ! -f "$metrics_csv" ]]; then
     log_error "[$Application] Metrics CSV not found: $metrics_csv"
-    grep -v "$ProjDir" "$qcdir_file_list" > "$nonarchive_tmp_file"
-    mv "$nonarchive_tmp_file" "$qcdir_file_list"
+    mark_qcdir_failed
     log_info "[$Application] will recollect $ProjDir in future gather"
     return 1
   fi
@@ -1377,8 +1418,7 @@ SQL
 
     if [[ $? -ne 0 ]]; then
       log_error "[$Application] Failed to load CSV into temp table from: $metrics_csv"
-      grep -v "$ProjDir" "$qcdir_file_list" > "$nonarchive_tmp_file"
-      mv "$nonarchive_tmp_file" "$qcdir_file_list"
+      mark_qcdir_failed
       log_info "[$Application] will recollect $ProjDir in future gather"
       cat "$duckDB_errorlog" >&2
       mail -s "[DASHBOARD] Failure importing PacBio metrics $Application" "$Email" <<EOF
@@ -1425,8 +1465,7 @@ SQL
       log_warn "[$Application] CONSTRAINT error on $(basename "$metrics_csv")"
     elif [[ -s "$duckDB_errorlog" ]]; then
       log_error "[$Application] Unexpected error importing $(basename "$metrics_csv"). See $duckDB_errorlog"
-      grep -v "$ProjDir" "$qcdir_file_list" > "$nonarchive_tmp_file"
-      mv "$nonarchive_tmp_file" "$qcdir_file_list"
+      mark_qcdir_failed
       log_info "[$Application] will recollect $ProjDir in future gather"
     fi
   ) 200>"$duckDB_lockfile"
@@ -1450,8 +1489,7 @@ SQL
 insert_ont_metrics_to_duckdb() {
   if [[ ! -f "$metrics_csv" ]]; then
     log_error "[$Application] Metrics CSV not found: $metrics_csv"
-    grep -v "$ProjDir" "$qcdir_file_list" > "$nonarchive_tmp_file"
-    mv "$nonarchive_tmp_file" "$qcdir_file_list"
+    mark_qcdir_failed
     log_info "[$Application] will recollect $ProjDir in future gather"
     return 1
   fi
@@ -1509,8 +1547,7 @@ SQL
 
     if [[ $? -ne 0 ]]; then
       log_error "[$Application] Failed to load CSV into temp table from: $metrics_csv"
-      grep -v "$ProjDir" "$qcdir_file_list" > "$nonarchive_tmp_file"
-      mv "$nonarchive_tmp_file" "$qcdir_file_list"
+      mark_qcdir_failed
       log_info "[$Application] will recollect $ProjDir in future gather"
       cat "$duckDB_errorlog" >&2
       mail -s "[DASHBOARD] Failure importing ONT metrics $Application" "$Email" <<EOF
@@ -1555,13 +1592,11 @@ SQL
 
     if grep -q "PRIMARY KEY or UNIQUE constraint violation" "$duckDB_errorlog"; then
       log_warn "[ONT] CONSTRAINT error on $(basename "$metrics_csv")"
-      grep -v "$ProjDir" "$qcdir_file_list" > "$nonarchive_tmp_file"
-      mv "$nonarchive_tmp_file" "$qcdir_file_list"
+      mark_qcdir_failed
       log_info "[$Application] will recollect $ProjDir in future gather"
     elif [[ -s "$duckDB_errorlog" ]]; then
       log_error "[ONT] Unexpected error importing $(basename "$metrics_csv"). See $duckDB_errorlog"
-      grep -v "$ProjDir" "$qcdir_file_list" > "$nonarchive_tmp_file"
-      mv "$nonarchive_tmp_file" "$qcdir_file_list"
+      mark_qcdir_failed
       log_info "[$Application] will recollect $ProjDir in future gather"
     fi
   ) 200>"$duckDB_lockfile"
@@ -1630,8 +1665,7 @@ extract_and_process_run_metrics_illumina() {
       lane_tmp="$OUT/${projectId}_QCreport.$Application.$n.lane${Lane}.csv"
       if ! gather_illumina_metrics_js > "$lane_tmp"; then
         log_error "[$Application] Skipping → $projectId (lane $Lane): pivot/gather script failed or missing Reads_Total"
-        grep -v "$ProjDir" "$qcdir_file_list" > "$nonarchive_tmp_file"
-        mv "$nonarchive_tmp_file" "$qcdir_file_list"
+        mark_qcdir_failed
         log_info "[$Application] will recollect $ProjDir in future gather"
         rm -f "$lane_tmp"
         continue
@@ -1647,8 +1681,7 @@ extract_and_process_run_metrics_illumina() {
     lane_tmp="$OUT/${projectId}_QCreport.$Application.$n.lane${Lane}.csv"
     if ! gather_illumina_metrics_js > "$lane_tmp"; then
       log_warn "[$Application] Skipping → $projectId (no RunMetricsSummary): pivot failed or Reads_Total missing"
-      grep -v "$ProjDir" "$qcdir_file_list" > "$nonarchive_tmp_file"
-      mv "$nonarchive_tmp_file" "$qcdir_file_list"
+      mark_qcdir_failed
       log_info "[$Application] will recollect $ProjDir in future gather"
       rm -f "$lane_tmp"
       return 1
@@ -1662,8 +1695,7 @@ extract_and_process_run_metrics_illumina() {
     duckDB_call
   else
     log_warn "[$Application] No metrics file created → $projectId; skipping DB import"
-    grep -v "$ProjDir" "$qcdir_file_list" > "$nonarchive_tmp_file"
-    mv "$nonarchive_tmp_file" "$qcdir_file_list"
+    mark_qcdir_failed
     log_info "[$Application] will recollect $ProjDir in future gather"
     return 1
   fi
@@ -2080,9 +2112,8 @@ This is unlikely, but in the event that GTdashboardMetrics.duckdb was partially
 Recommended Actions:
 ACTION 1: Check the timestamp of GTdashboardMetrics.duckdb and compare it to the time this email was received.
 ACTION 2: If the timestamp has changed unexpectedly, inspect the database by comparing it with its most recent snapshot in .last_import_push/.
-ACTION 3: Identify and fix the cause of the failure. Then remove any of the following temporary files (if present) inside .whitelist_QCdir/: 
-          a. *.QCDir_nonarchive.txt
-          b. *.QCDir_nonarchive.update.txt
+ACTION 3: Identify and fix the cause of the failure. Then clear the pending QC directories of the failed application so they are recollected:
+          python3 $qcDirStateScript --db $OUT/.whitelist_QCdir/qcdir_state.sqlite --app ${Application:-<Application>} clear --status pending
 ACTION 4: If necessary, restore the previous known-good snapshot: Copy the latest valid snapshot from .last_import_push/GTdashboardMetrics.duckdb.
           Ensure the snapshot is not empty. Re-run the script after restoring.
 Note: These steps may usually not required. The script is designed with safeguards to prevent corruption of the database under most circumstances
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+
+import argparse
+import bz2
+import gzip
+import lzma
+import os
+import sys
+import tarfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from glob import glob
+
+# ─────────────────────────────────────────────────────────────
+# Codec configuration
+# Every codec below accepts concatenated streams, so each chunk is compressed
+# independently on its own core and the members are written back in order.
+# The result is still readable by plain `tar -xf` / `tar -tvf`.
+CODECS = {
+    "gzip":  {"compress": lambda data, level: gzip.compress(data, compresslevel=level), "levels": range(1, 10), "default": 6},
+    "bzip2": {"compress": lambda data, level: bz2.compress(data, compresslevel=level), "levels": range(1, 10), "default": 9},
+    "xz":    {"compress": lambda data, level: lzma.compress(data, preset=level), "levels": range(0, 10), "default": 6},
+}
+DEFAULT_CODEC = "bzip2"
+CHUNK_SIZE = 4 * 1024 * 1024  # Uncompressed bytes per compression job
+MAX_DEFAULT_THREADS = 8  # Default cap: runs on shared interactive hosts; up to 2x threads chunks are held in memory
+
+# ─────────────────────────────────────────────────────────────
+# Error handling
+def exit_with_error(message):
+    print(f"[ERROR] {message}")
+    sys.exit(1)
+
+# ─────────────────────────────────────────────────────────────
+# File-like sink that compresses chunks on a thread pool
+# zlib, bz2 and lzma release the GIL while compressing, so threads scale across cores.
+class ParallelCompressedWriter:
+    def __init__(self, out_file, codec, level, threads, chunk_size=CHUNK_SIZE):
+        self.out_file = out_file
+        self.compress = CODECS[codec]["compress"]
+        self.level = level
+        self.chunk_size = chunk_size
+        self.max_pending = threads * 2  # Bound memory: at most this many chunks in flight
+        self.executor = ThreadPoolExecutor(max_workers=threads)
+        self.pending = deque()
+        self.buffer = bytearray()
+
+    def write(self, data):
+        self.buffer += data
+        while len(self.buffer) >= self.chunk_size:
+            self._submit(bytes(self.buffer[:self.chunk_size]))
+            del self.buffer[:self.chunk_size]
+        return len(data)
+
+    def _submit(self, chunk):
+        self.pending.append(self.executor.submit(self.compress, chunk, self.level))
+        while len(self.pending) > self.max_pending:
+            self._drain_one()
+
+    def _drain_one(self):
+        self.out_file.write(self.pending.popleft().result())
+
+    def close(self):
+        if self.buffer:
+            self._submit(bytes(self.buffer))
+            self.buffer.clear()
+        while self.pending:
+            self._drain_one()
+        self.executor.shutdown()
+
+    def abort(self):
+        for future in self.pending:
+            future.cancel()
+        self.pending.clear()
+        self.executor.shutdown()
+
+# ─────────────────────────────────────────────────────────────
+# Stream every matching file from the source directory into the archive
+# Files are read in place; nothing is staged in the destination folder.
+def build_archive(source_dir, pattern, archive_path, codec, level, threads):
+    files = sorted(glob(os.path.join(source_dir, pattern)))
+    if not files:
+        exit_with_error(f"No files matching '{pattern}' found in {source_dir}")
+
+    tmp_path = f"{archive_path}.tmp"
+    with open(tmp_path, "wb") as out_file:
+        writer = ParallelCompressedWriter(out_file, codec, level, threads)
+        try:
+            with tarfile.open(fileobj=writer, mode="w|", format=tarfile.PAX_FORMAT) as tar:
+                for path in files:
+                    tar.add(path, arcname=os.path.basename(path), recursive=False)
+            writer.close()
+        except BaseException:
+            writer.abort()
+            out_file.close()
+            os.remove(tmp_path)
+            raise
+    os.replace(tmp_path, archive_path)
+    return len(files)
+
+# ─────────────────────────────────────────────────────────────
+# Argument parsing and execution
+def main():
+    parser = argparse.ArgumentParser(description='Stream FastQC html reports into a multi-core compressed tar archive')
+    parser.add_argument('--inputDir', required=True, help='Directory holding FastQC reports (e.g., $qcFolder/fastqc)')
+    parser.add_argument('--outputFile', required=True, help='Archive to create (e.g., Reports/<proj>/<proj>_FASTQCreports.tgz)')
+    parser.add_argument('--pattern', default='*html', help='Glob of files to include (default: *html)')
+    parser.add_argument('--codec', default=DEFAULT_CODEC, choices=sorted(CODECS), help=f'Compression codec (default: {DEFAULT_CODEC})')
+    parser.add_argument('--level', type=int, help='Compression level (default depends on codec)')
+    parser.add_argument('--threads', type=int, default=min(os.cpu_count() or 1, MAX_DEFAULT_THREADS), help=f'Number of compression threads (default: all cores, at most {MAX_DEFAULT_THREADS})')
+
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.inputDir):
+        exit_with_error(f"Input directory not found: {args.inputDir}")
+    level = CODECS[args.codec]["default"] if args.level is None else args.level
+    if level not in CODECS[args.codec]["levels"]:
+        levels = CODECS[args.codec]["levels"]
+        exit_with_error(f"Level {level} invalid for {args.codec}; expected {levels.start}-{levels.stop - 1}")
+    if args.threads < 1:
+        exit_with_error("--threads must be at least 1")
+
+    count = build_archive(args.inputDir, args.pattern, args.outputFile, args.codec, level, args.threads)
+    print(f"[INFO] {count} file(s) archived with {args.codec} (level {level}, {args.threads} threads) @ {args.outputFile}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+
+import argparse
+import os
+import sqlite3
+import sys
+import time
+from contextlib import contextmanager
+
+# ─────────────────────────────────────────────────────────────
+# Configuration
+# One SQLite file shared by gatherwebQCmetrics.sh (through the CLI below) and the Python gatherers (by import).
+DEFAULT_DB = "/gt/data/seqdma/GTwebMetricsTables/.whitelist_QCdir/qcdir_state.sqlite"
+STATUSES = ("pending", "done", "failed")  # pending: in current batch; done: collected; failed: recollect later
+BUSY_TIMEOUT = 120  # Seconds to wait on a concurrent writer before giving up
+
+# Exit codes understood by gatherwebQCmetrics.sh (argparse usage errors exit 2)
+EXIT_STORE_ERROR = 3
+EXIT_NOT_INITIALISED = 4
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS qc_dir_state (
+    application TEXT NOT NULL,
+    directory   TEXT NOT NULL,
+    status      TEXT NOT NULL,
+    attempts    INTEGER NOT NULL DEFAULT 0,
+    last_seen   TEXT NOT NULL,
+    PRIMARY KEY (application, directory)
+);
+CREATE INDEX IF NOT EXISTS idx_qc_dir_state_status ON qc_dir_state (application, status);
+CREATE TABLE IF NOT EXISTS qc_app_state (
+    application TEXT PRIMARY KEY,
+    initialised TEXT NOT NULL
+);
+"""
+
+# ─────────────────────────────────────────────────────────────
+# Error handling
+def exit_with_error(message, code=EXIT_STORE_ERROR):
+    print(f"[ERROR] {message}", file=sys.stderr)
+    sys.exit(code)
+
+def now():
+    return time.strftime("%Y-%m-%d %H:%M:%S")
+
+def unique(directories):
+    """Strip blanks and duplicates while keeping the input order."""
+    return list(dict.fromkeys(d.strip() for d in directories if d.strip()))
+
+# ─────────────────────────────────────────────────────────────
+# State store
+# Lookups go through the (application, directory) primary key; bulk operations run as one transaction.
+class QCDirState:
+    def __init__(self, db_path=DEFAULT_DB):
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        # Rollback journal rather than WAL: the database lives on a shared network filesystem
+        self.con = sqlite3.connect(db_path, timeout=BUSY_TIMEOUT, isolation_level=None)
+        self.con.executescript(SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.con.close()
+
+    @contextmanager
+    def transaction(self):
+        self.con.execute("BEGIN IMMEDIATE")
+        try:
+            yield self.con
+        except BaseException:
+            self.con.execute("ROLLBACK")
+            raise
+        self.con.execute("COMMIT")
+
+    def _load_candidates(self, con, directories):
+        con.execute("CREATE TEMP TABLE IF NOT EXISTS candidates (directory TEXT PRIMARY KEY, ord INTEGER)")
+        con.execute("DELETE FROM temp.candidates")
+        con.executemany("INSERT INTO temp.candidates VALUES (?, ?)", ((d, i) for i, d in enumerate(directories)))
+
+    # Return candidates that are not yet done, in input order, and stamp every known candidate as seen
+    def filter_new(self, application, directories):
+        directories = unique(directories)
+        with self.transaction() as con:
+            self._load_candidates(con, directories)
+            con.execute("""
+                UPDATE qc_dir_state SET last_seen = ?
+                WHERE application = ? AND directory IN (SELECT directory FROM temp.candidates)
+            """, (now(), application))
+            rows = con.execute("""
+                SELECT c.directory FROM temp.candidates c
+                LEFT JOIN qc_dir_state s ON s.application = ? AND s.directory = c.directory
+                WHERE s.status IS NULL OR s.status != 'done'
+                ORDER BY c.ord
+            """, (application,)).fetchall()
+        return [r[0] for r in rows]
+
+    # Set the status of many directories at once; failed marks count as another attempt
+    # With replace=True, rows already in this status but missing from directories are dropped.
+    def mark(self, application, directories, status, replace=False):
+        if status not in STATUSES:
+            raise ValueError(f"Unknown status '{status}'; expected one of {', '.join(STATUSES)}")
+        directories = unique(directories)
+        seen = now()
+        increment = 1 if status == "failed" else 0
+        with self.transaction() as con:
+            if replace:
+                self._load_candidates(con, directories)
+                con.execute("""
+                    DELETE FROM qc_dir_state
+                    WHERE application = ? AND status = ? AND directory NOT IN (SELECT directory FROM temp.candidates)
+                """, (application, status))
+            # INSERT OR IGNORE + UPDATE instead of UPSERT so older system SQLite builds still work
+            con.executemany("""
+                INSERT OR IGNORE INTO qc_dir_state (application, directory, status, attempts, last_seen)
+                VALUES (?, ?, ?, 0, ?)
+            """, ((application, d, status, seen) for d in directories))
+            con.executemany("""
+                UPDATE qc_dir_state SET status = ?, attempts = attempts + ?, last_seen = ?
+                WHERE application = ? AND directory = ?
+            """, ((status, increment, seen, application, d) for d in directories))
+        return len(directories)
+
+    def promote(self, application, from_status, to_status):
+        with self.transaction() as con:
+            return con.execute("""
+                UPDATE qc_dir_state SET status = ?, last_seen = ? WHERE application = ? AND status = ?
+            """, (to_status, now(), application, from_status)).rowcount
+
+    def clear(self, application, status):
+        with self.transaction() as con:
+            return con.execute("DELETE FROM qc_dir_state WHERE application = ? AND status = ?",
+                               (application, status)).rowcount
+
+    def list(self, application, status):
+        rows = self.con.execute("""
+            SELECT directory FROM qc_dir_state WHERE application = ? AND status = ? ORDER BY directory
+        """, (application, status)).fetchall()
+        return [r[0] for r in rows]
+
+    # Applications are marked once their first directory scan has run; clear() never resets this
+    def initialise(self, application):
+        with self.transaction() as con:
+            con.execute("INSERT OR IGNORE INTO qc_app_state (application, initialised) VALUES (?, ?)", (application, now()))
+
+    def is_initialised(self, application):
+        return self.con.execute("SELECT 1 FROM qc_app_state WHERE application = ?", (application,)).fetchone() is not None
+
+    def count(self, application, status=None):
+        if status:
+            query = "SELECT COUNT(*) FROM qc_dir_state WHERE application = ? AND status = ?"
+            return self.con.execute(query, (application, status)).fetchone()[0]
+        return self.con.execute("SELECT COUNT(*) FROM qc_dir_state WHERE application = ?", (application,)).fetchone()[0]
+
+    # One-time import of a legacy flat whitelist file; the file is renamed so it is not imported twice
+    def migrate_flat_file(self, application, path, status):
+        if not os.path.exists(path):
+            return 0
+        with open(path) as f:
+            imported = self.mark(application, f, status)
+        self.initialise(application)
+        os.replace(path, f"{path}.migrated")
+        return imported
+
+# ─────────────────────────────────────────────────────────────
+# Argument parsing and execution
+# Directories are read from stdin (one per line) unless --dir is given.
+def read_directories(args):
+    if args.dir:
+        return args.dir
+    return sys.stdin.read().splitlines()
+
+def main():
+    parser = argparse.ArgumentParser(description='Track which QC directories have been collected per application')
+    parser.add_argument('--db', default=DEFAULT_DB, help=f'SQLite state file (default: {DEFAULT_DB})')
+    parser.add_argument('--app', required=True, help='Application name (e.g., wgs, PacBio, speciesid)')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    subparsers.add_parser('filter', help='Print candidate directories from stdin that are not yet done')
+
+    mark_parser = subparsers.add_parser('mark', help='Set the status of directories')
+    mark_parser.add_argument('--status', required=True, choices=STATUSES)
+    mark_parser.add_argument('--dir', action='append', help='Directory to mark (repeatable); stdin if omitted')
+    mark_parser.add_argument('--replace', action='store_true', help='Drop other directories currently in this status')
+
+    promote_parser = subparsers.add_parser('promote', help='Move every directory from one status to another')
+    promote_parser.add_argument('--from', dest='from_status', required=True, choices=STATUSES)
+    promote_parser.add_argument('--to', dest='to_status', required=True, choices=STATUSES)
+
+    clear_parser = subparsers.add_parser('clear', help='Forget every directory in a status')
+    clear_parser.add_argument('--status', required=True, choices=STATUSES)
+
+    list_parser = subparsers.add_parser('list', help='Print directories in a status')
+    list_parser.add_argument('--status', required=True, choices=STATUSES)
+
+    subparsers.add_parser('init', help='Record that the application has completed its first directory scan')
+    subparsers.add_parser('initialised', help=f'Exit 0 if the application has completed its first directory scan, else {EXIT_NOT_INITIALISED}')
+
+    migrate_parser = subparsers.add_parser('migrate', help='Import a legacy flat whitelist file and rename it to *.migrated')
+    migrate_parser.add_argument('--file', required=True)
+    migrate_parser.add_argument('--status', required=True, choices=STATUSES)
+
+    args = parser.parse_args()
+
+    try:
+        with QCDirState(args.db) as state:
+            if args.command == 'filter':
+                for directory in state.filter_new(args.app, sys.stdin.read().splitlines()):
+                    print(directory)
+            elif args.command == 'mark':
+                state.mark(args.app, read_directories(args), args.status, replace=args.replace)
+            elif args.command == 'promote':
+                state.promote(args.app, args.from_status, args.to_status)
+            elif args.command == 'clear':
+                state.clear(args.app, args.status)
+            elif args.command == 'list':
+                for directory in state.list(args.app, args.status):
+                    print(directory)
+            elif args.command == 'init':
+                state.initialise(args.app)
+            elif args.command == 'initialised':
+                sys.exit(0 if state.is_initialised(args.app) else EXIT_NOT_INITIALISED)
+            elif args.command == 'migrate':
+                imported = state.migrate_flat_file(args.app, args.file, args.status)
+                if imported:
+                    print(f"[INFO] Migrated {imported} {args.status} directories from {args.file}", file=sys.stderr)
+    except (sqlite3.Error, OSError) as e:
+        exit_with_error(f"QC directory state store {args.db}: {e}")
+
+if __name__ == '__main__':
+    main()
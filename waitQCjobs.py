@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+
+import argparse
+import os
+import pwd
+import re
+import subprocess
+import sys
+import time
+
+# ─────────────────────────────────────────────────────────────
+# Configuration
+JOB_ID_PATTERN = r"Submitted batch job (\d+)"  # sbatch stdout, if qifa-qc run passes it through to its log
+MIN_INTERVAL = 15    # Seconds before the first re-check
+MAX_INTERVAL = 180   # Upper bound on the backoff (matches gather_wait_time)
+BACKOFF_FACTOR = 2
+MAX_QUERY_FAILURES = 5  # Consecutive scheduler errors tolerated before giving up
+SUBMIT_CLOCK_SKEW = 60  # Seconds of slack between this host and the scheduler clock for --since
+SLURM_TIME_FORMAT = "%Y-%m-%dT%H:%M:%S"  # squeue %V
+
+# Exit codes understood by QCwrapperScript.sh
+EXIT_DONE = 0
+EXIT_ERROR = 1
+EXIT_NO_JOBS = 2
+
+# ─────────────────────────────────────────────────────────────
+# Error handling
+def exit_with_error(message, code=EXIT_ERROR):
+    print(f"[ERROR] {message}")
+    sys.exit(code)
+
+def log(message):
+    timestamp = time.strftime("[%Y-%m-%d %H:%M:%S]")
+    print(f"{timestamp} {message}", flush=True)
+
+# ─────────────────────────────────────────────────────────────
+# Collect job IDs written by the submitter into its log file(s)
+def read_job_ids(log_files, pattern=JOB_ID_PATTERN):
+    job_ids = set()
+    regex = re.compile(pattern)
+    for log_file in log_files:
+        if not os.path.exists(log_file):
+            log(f"Log file not found: {log_file}")
+            continue
+        with open(log_file) as f:
+            for line in f:
+                job_ids.update(regex.findall(line))
+    return job_ids
+
+# ─────────────────────────────────────────────────────────────
+# Scheduler backends
+# Each backend answers one question per poll: which of these job IDs are still queued or running?
+# submitted_since() finds the jobs of a qifa-qc run without relying on what it writes to its log.
+class SlurmScheduler:
+    def active_jobs(self, job_ids):
+        # One squeue call over the whole queue, filtered locally: querying finished IDs with -j errors out
+        # on some Slurm versions.
+        result = subprocess.run(["squeue", "-h", "-o", "%i"],
+                                capture_output=True, text=True, check=True)
+        queued = {line.strip().split("_")[0] for line in result.stdout.splitlines() if line.strip()}  # 123_[1-10] -> 123
+        return job_ids & queued
+
+    def submitted_since(self, since):
+        # Jobs of the account this process runs as (sbatch submits under the real uid, whatever $USER says
+        # under sudo). Other jobs the same account submits meanwhile are tracked too; that only delays the gather.
+        user = pwd.getpwuid(os.getuid()).pw_name
+        result = subprocess.run(["squeue", "-h", "-u", user, "-o", "%i %V"],
+                                capture_output=True, text=True, check=True)
+        job_ids = set()
+        for line in result.stdout.splitlines():
+            fields = line.split()
+            if len(fields) != 2:
+                continue
+            try:
+                submitted = time.mktime(time.strptime(fields[1], SLURM_TIME_FORMAT))
+            except ValueError:
+                continue
+            if submitted >= since - SUBMIT_CLOCK_SKEW:
+                job_ids.add(fields[0].split("_")[0])
+        return job_ids
+
+class FakeScheduler:
+    """Local stand-in for Slurm: each job is a file in queue_dir holding its finish time (epoch seconds)."""
+
+    def __init__(self, queue_dir):
+        self.queue_dir = queue_dir
+        os.makedirs(queue_dir, exist_ok=True)
+
+    def submit(self, duration):
+        job_id = str(len(os.listdir(self.queue_dir)) + 1)
+        while os.path.exists(os.path.join(self.queue_dir, job_id)):
+            job_id = str(int(job_id) + 1)
+        with open(os.path.join(self.queue_dir, job_id), "w") as f:
+            f.write(f"{time.time() + duration}\n")
+        return job_id
+
+    def active_jobs(self, job_ids):
+        now = time.time()
+        active = set()
+        for job_id in job_ids:
+            job_file = os.path.join(self.queue_dir, job_id)
+            if os.path.exists(job_file):
+                with open(job_file) as f:
+                    if float(f.read().strip() or 0) > now:
+                        active.add(job_id)
+        return active
+
+    def submitted_since(self, since):
+        return {job_id for job_id in os.listdir(self.queue_dir)
+                if os.path.getmtime(os.path.join(self.queue_dir, job_id)) >= since}
+
+# ─────────────────────────────────────────────────────────────
+# Poll the scheduler with adaptive backoff until every tracked job has left the queue
+# The interval doubles while nothing changes and drops back to the minimum whenever a job finishes.
+def wait_for_jobs(scheduler, job_ids, min_interval=MIN_INTERVAL, max_interval=MAX_INTERVAL,
+                  timeout=None, sleep=time.sleep):
+    remaining = set(job_ids)
+    interval = min_interval
+    failures = 0
+    started = time.time()
+
+    while True:
+        try:
+            active = scheduler.active_jobs(remaining)
+            failures = 0
+        except (subprocess.CalledProcessError, OSError) as e:
+            failures += 1
+            log(f"Scheduler query failed ({failures}/{MAX_QUERY_FAILURES}): {e}")
+            if failures >= MAX_QUERY_FAILURES:
+                return False
+            active = remaining
+
+        if not active:
+            log(f"All {len(job_ids)} job(s) finished.")
+            return True
+
+        if active != remaining:
+            log(f"{len(remaining) - len(active)} job(s) finished; {len(active)} still queued or running.")
+            remaining = active
+            interval = min_interval
+
+        if timeout and time.time() - started + interval > timeout:
+            log(f"Timed out after {int(time.time() - started)}s with {len(remaining)} job(s) outstanding.")
+            return False
+        sleep(interval)
+        interval = min(interval * BACKOFF_FACTOR, max_interval)
+
+# ─────────────────────────────────────────────────────────────
+# Argument parsing and execution
+def build_scheduler(args):
+    if args.scheduler == "fake":
+        if not args.queueDir:
+            exit_with_error("--queueDir is required with --scheduler fake")
+        return FakeScheduler(args.queueDir)
+    return SlurmScheduler()
+
+def main():
+    parser = argparse.ArgumentParser(description='Wait for submitted QC jobs to finish before running a single qifa-qc gather')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    wait_parser = subparsers.add_parser('wait', help='Block until all tracked jobs have left the scheduler queue')
+    wait_parser.add_argument('--log', nargs='*', default=[], help='Submission log file(s) to read job IDs from')
+    wait_parser.add_argument('--jobIds', help='Comma-separated job IDs to track in addition to --log')
+    wait_parser.add_argument('--jobPattern', default=JOB_ID_PATTERN, help='Regex with one group capturing a job ID')
+    wait_parser.add_argument('--since', type=float, help='Also track jobs submitted at or after this epoch time (e.g., $(date +%%s) before qifa-qc run)')
+    wait_parser.add_argument('--minInterval', type=float, default=MIN_INTERVAL, help=f'First poll interval in seconds (default: {MIN_INTERVAL})')
+    wait_parser.add_argument('--maxInterval', type=float, default=MAX_INTERVAL, help=f'Maximum poll interval in seconds (default: {MAX_INTERVAL})')
+    wait_parser.add_argument('--timeout', type=float, help='Give up after this many seconds')
+    wait_parser.add_argument('--scheduler', choices=['slurm', 'fake'], default='slurm', help='Scheduler backend (default: slurm)')
+    wait_parser.add_argument('--queueDir', default=os.environ.get('QC_FAKE_QUEUE_DIR'), help='Queue directory for --scheduler fake (default: $QC_FAKE_QUEUE_DIR)')
+
+    submit_parser = subparsers.add_parser('fake-submit', help='Queue jobs on the local fake scheduler and print sbatch-style lines')
+    submit_parser.add_argument('--queueDir', required=True, help='Queue directory for the fake scheduler (for qifa-script, export as $QC_FAKE_QUEUE_DIR with QC_WAIT_SCHEDULER=fake)')
+    submit_parser.add_argument('--duration', type=float, default=30, help='Seconds each fake job runs (default: 30)')
+    submit_parser.add_argument('--count', type=int, default=1, help='Number of fake jobs to queue (default: 1)')
+
+    args = parser.parse_args()
+
+    if args.command == 'fake-submit':
+        scheduler = FakeScheduler(args.queueDir)
+        for _ in range(args.count):
+            print(f"Submitted batch job {scheduler.submit(args.duration)}")
+        return
+
+    if args.minInterval <= 0 or args.maxInterval < args.minInterval:
+        exit_with_error("--minInterval must be > 0 and <= --maxInterval")
+
+    scheduler = build_scheduler(args)
+    job_ids = read_job_ids(args.log, args.jobPattern)
+    if args.jobIds:
+        job_ids.update(j.strip() for j in args.jobIds.split(',') if j.strip())
+    if args.since is not None:
+        try:
+            job_ids.update(scheduler.submitted_since(args.since))
+        except (subprocess.CalledProcessError, OSError) as e:
+            log(f"Could not list jobs submitted since {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(args.since))}: {e}")
+    if not job_ids:
+        exit_with_error("No job IDs found to wait on", code=EXIT_NO_JOBS)
+
+    log(f"Tracking {len(job_ids)} job(s) on {args.scheduler}.")
+    if not wait_for_jobs(scheduler, job_ids, args.minInterval, args.maxInterval, args.timeout):
+        sys.exit(EXIT_ERROR)
+
+if __name__ == '__main__':
+    main()